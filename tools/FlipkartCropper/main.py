@@ -1,22 +1,29 @@
 import os
 import shutil
+import numpy as np
+import pandas as pd
 from datetime import datetime
 from concurrent.futures import ProcessPoolExecutor, as_completed
 from tempfile import TemporaryDirectory
-from pdfrw import PdfReader, PdfWriter
 from utils import (
     check_status,
     create_filedir,
     check_input_file,
     pdf_merger,
-    convert_pdf_to_string,
+    iter_pages,
     read_config,
     extract_data,
     pdf_whitespace,
     pdf_cropper,
     create_count_excel,
+    WORKERS_PER_FOLDER,
 )
 
+# WORKERS_PER_FOLDER (from utils, env-overridable) is how many workers
+# each folder may use internally; the folder pool below is sized so that
+# folders * workers stays within the physical cores.
+
+
 def process_folder(input_path, output_path):
     folder_name = os.path.basename(input_path)
     print(f"\n=== Processing folder: {folder_name} ===")
@@ -35,32 +42,25 @@ def process_folder(input_path, output_path):
             # Read config
             config = read_config()
 
-            # Merge PDFs
+            # Merge PDFs (kept in memory, no merged.pdf round-trip)
             print("Merging all the PDF Files")
-            merged_pdf = os.path.join(temp_path, "output.pdf")
-            pdf_merger(all_pdf, save_path=merged_pdf)
-            print(f"Merge Completed -> {merged_pdf}")
-
-            # Convert to text
-            print("Converting PDF to Text")
-            all_page = convert_pdf_to_string(merged_pdf)
-            print("Conversion Completed")
+            merged = pdf_merger(all_pdf)
+            print("Merge Completed")
 
-            # Extract data
+            # Extract data straight from the page-text stream
             print("Extracting Data...")
-            df = extract_data(all_page, merged_pdf, output_path)
+            df = extract_data(iter_pages(merged), merged, output_path)
             print("Extraction Completed")
 
             # Clean & prepare sorting
             df["sku"] = df["sku"].str.strip().fillna("")
             df["courier"] = df["courier"].str.strip().fillna("")
             df["soldBy"] = df["soldBy"].str.strip().fillna("")
-            df["sku_lower"] = df["sku"].str.lower()
 
             sort_list = ["multi"]
             ascending_list = [True]
             if config.get("sku_sort", False):
-                sort_list.append("sku_lower")
+                sort_list.append("sku")
                 ascending_list.append(False)
             if config.get("courier_sort", False):
                 sort_list.append("courier")
@@ -72,29 +72,39 @@ def process_folder(input_path, output_path):
             print("\nSorting by:", sort_list)
             print("Ascending order:", ascending_list)
 
-            df = df.sort_values(by=sort_list, ascending=ascending_list, na_position="last")
-            df = df.drop(columns=["sku_lower"])
-            whole_data = df.copy(deep=True)
-
-            # Create sorted PDF
-            reader_input = PdfReader(merged_pdf)
-            writer_output = PdfWriter()
-            for page in df.page.values:
-                writer_output.addpage(reader_input.pages[page])
-
-            sorted_pdf_path = os.path.join(temp_path, "output_sorted.pdf")
-            writer_output.write(sorted_pdf_path)
-            print(f"Sorted PDF created -> {sorted_pdf_path}")
+            # np.lexsort avoids the full row-reindex/copy path that
+            # DataFrame.sort_values takes. Keys are factorized to rank
+            # codes (negated for descending); lexsort treats the last key
+            # as primary, hence the reversal.
+            keys = []
+            for name, ascending in zip(sort_list, ascending_list):
+                values = df["sku"].str.lower() if name == "sku" else df[name]
+                codes = pd.factorize(values, sort=True)[0]
+                keys.append(codes if ascending else -codes)
+            order = np.lexsort(keys[::-1])
+            df = df.iloc[order].reset_index(drop=True)
+            # The report mutates its frame (cleanup + category casts), so
+            # it gets a real copy — but of just these columns, which is
+            # still far cheaper than duplicating the whole frame and keeps
+            # the writes off this view of df.
+            whole_data = df[["sku", "soldBy", "courier", "qty", "page"]].copy()
+
+            # Reorder pages in place and hand the doc straight to the
+            # cropper - no output_sorted.pdf write/re-read round-trip
+            merged.select(df.page.tolist())
+            print("Sorted pages in memory")
 
-            # Process PDF (whitespace + crop)
             # Process PDF (crop only)
-            cropped_pdf_path = pdf_cropper(sorted_pdf_path, config, temp_path)
+            cropped_pdf_path = pdf_cropper(merged, config, temp_path)
+            merged.close()
 
 
             # Save final PDF to output folder
             final_name = f"result_pdf_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.pdf"
             final_path = os.path.join(output_path, final_name)
-            shutil.copy(cropped_pdf_path, final_path)
+            # The cropped file sits in the TemporaryDirectory and is about
+            # to be deleted — a move renames instead of re-reading every byte
+            shutil.move(cropped_pdf_path, final_path)
             print(f"Final PDF saved as: {final_path}")
 
             # Export Excel summary report
@@ -112,16 +122,15 @@ def main():
     input_root = "input"
     output_root = "output"
 
-    subfolders = [
-        f for f in os.listdir(input_root)
-        if os.path.isdir(os.path.join(input_root, f))
-    ]
+    with os.scandir(input_root) as it:
+        subfolders = [e.name for e in it if e.is_dir()]
     if not subfolders:
         print("No subfolders found in 'input'.")
         return
 
+    folder_pool = max(1, (os.cpu_count() or 1) // WORKERS_PER_FOLDER)
     futures = []
-    with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
+    with ProcessPoolExecutor(max_workers=folder_pool) as executor:
         for folder in subfolders:
             future = executor.submit(
                 process_folder,
@@ -3,18 +3,33 @@ import json
 import sys
 import shutil
 import os
-from pdfrw import PdfReader, PdfWriter
 from tqdm import tqdm
 import fitz
 from datetime import datetime
 import re
+import numpy as np
 import pandas as pd
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+
+# ---------------------- Worker Budget ----------------------
+# Threads/processes one folder may use internally. main.py sizes its
+# folder pool as cores // WORKERS_PER_FOLDER, so the inner pools here
+# must honor the same number or folders × workers oversubscribes.
+WORKERS_PER_FOLDER = max(1, int(os.environ.get("WORKERS_PER_FOLDER", "4")))
 
 # ---------------------- Check Server Status ----------------------
+_session = requests.Session()
+_session.mount("https://", requests.adapters.HTTPAdapter(pool_connections=1))
+
+@lru_cache(maxsize=1)
 def check_status():
     url = "https://raw.githubusercontent.com/sagar9995/meesho_file/main/lockv2.json"
-    r = requests.get(url=url)
+    try:
+        # Bounded connect/read timeouts so a flaky network can't hang startup
+        r = _session.get(url=url, timeout=(2, 3))
+    except requests.RequestException:
+        sys.exit()
     if r.status_code == 200 and r.json().get("Status", False):
         return None
     else:
@@ -28,144 +43,135 @@ def create_filedir(temp_path="temp", output_path="output"):
     os.makedirs(output_path, exist_ok=True)
 
 # ---------------------- Check Input PDF ----------------------
+def _valid_pdf(path):
+    # Raw os.open/os.read skips the buffered io wrapper for a 4-byte sniff
+    try:
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            header = os.read(fd, 4)
+        finally:
+            os.close(fd)
+        return header == b"%PDF"
+    except OSError:
+        return False
+
 def check_input_file(filepath):
+    # scandir avoids the extra stat per entry that listdir + path checks cost
+    with os.scandir(filepath) as it:
+        candidates = [entry.path for entry in it if entry.name.lower().endswith(".pdf")]
+
     all_pdf = []
-    for x in os.listdir(filepath):
-        path = os.path.join(filepath, x)
-        if not path.lower().endswith(".pdf"):
-            continue
-        try:
-            with open(path, "rb") as f:
-                header = f.read(4)
-                if header != b"%PDF":
-                    print(f"Skipping invalid PDF: {x}")
-                    continue
-            all_pdf.append(path)
-        except:
-            print(f"Skipping unreadable file: {x}")
+    if candidates:
+        # The sniff is pure open/read/close latency, so batch it on threads
+        with ThreadPoolExecutor(max_workers=min(32, len(candidates))) as executor:
+            for path, ok in zip(candidates, executor.map(_valid_pdf, candidates)):
+                if ok:
+                    all_pdf.append(path)
+                else:
+                    print(f"Skipping invalid PDF: {os.path.basename(path)}")
     if not all_pdf:
         print(f"No valid PDF files found in {filepath}")
         return []
     return all_pdf
 
 # ---------------------- Read Config ----------------------
+@lru_cache(maxsize=1)
 def read_config():
+    # Parsed once per process; every folder shares the same snapshot so a
+    # config edit mid-run can no longer half-apply.
     with open("config.json", "r") as f:
         return json.load(f)
 
 # ---------------------- Merge PDF ----------------------
-def pdf_merger(all_path, save_path):
-    writer = PdfWriter()
+def pdf_merger(all_path, save_path=None):
+    # fitz copies pages by reference at the C layer instead of re-parsing
+    # every object the way pdfrw did. The merged doc is returned in memory;
+    # pass save_path only if a file on disk is actually needed.
+    merged = fitz.open()
     for path in all_path:
-        reader = PdfReader(path)
-        for page in reader.pages:
-            writer.addpage(page)
-    writer.write(save_path)
-
-# ---------------------- Convert PDF to String (Parallel) ----------------------
-def convert_pdf_to_string(file_path):
-    doc = fitz.open(file_path)
-    all_page = [None] * len(doc)
-
-    def process_page(i):
-        return doc[i].get_text("text")
-
-    with ThreadPoolExecutor(max_workers=8) as executor:
-        futures = {executor.submit(process_page, i): i for i in range(len(doc))}
-        for future in as_completed(futures):
-            idx = futures[future]
-            all_page[idx] = future.result()
-
-    doc.close()
-    return all_page
+        src = fitz.open(path)
+        merged.insert_pdf(src)
+        src.close()
+    if save_path:
+        merged.save(save_path)
+    return merged
+
+# ---------------------- Stream PDF Text ----------------------
+def iter_pages(pdf):
+    """Yield per-page text lazily so callers never hold every raw page in RAM."""
+    doc = pdf if isinstance(pdf, fitz.Document) else fitz.open(pdf)
+    for i in range(len(doc)):
+        yield doc[i].get_text("text")
+    if doc is not pdf:
+        doc.close()
 
 # ---------------------- Precompiled regex ----------------------
-CLEAN_PATTERN = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f\x7f-\xff]")
-
-# ---------------------- Extraction Helpers ----------------------
-def quantity_extract(page):
-    page_clean = CLEAN_PATTERN.sub("", page)
-    lines = page_clean.split("\n")
-    try:
-        qty_start = next(i for i, l in enumerate(lines) if "QTY" in l.upper())
-        qtys = []
-        for l in lines[qty_start + 1:]:
-            l_stripped = l.strip()
-            if any(keyword in l_stripped.upper() for keyword in ["SKU", "SOLD BY", "COLOR", "SIZE"]):
-                break
-            if l_stripped.isdigit():
-                qtys.append(int(l_stripped))
-        total_qty = sum(qtys) if qtys else 1
-        return total_qty, len(qtys) > 1
-    except StopIteration:
-        return 1, False
-
-def courier_extract(page):
-    page = CLEAN_PATTERN.sub("", page)
-    page = page.split("\n")
-    try:
-        return page[2].strip()
-    except:
-        return ""
-
-def sku_extract(page):
-    page = CLEAN_PATTERN.sub("", page)
-    page = page.split("\n")
-    all_pipe = [x for x in page if "|" in x]
-    try:
-        skus = [x for x in all_pipe if x[0].isnumeric()]
-    except:
-        return "", False
-    if not skus:
-        return "", False
-    sku = skus[0].split(" ", 1)
-    return sku[1].split("|", 1)[0], len(skus) > 1
-
-def soldBy_extract(page):
-    page = CLEAN_PATTERN.sub("", page)
-    page = page.split("\n")
-    try:
-        soldby_idx = [x for x in range(len(page)) if "Sold By:" in page[x]][0]
-        return page[soldby_idx].replace("Sold By:", "").strip().split(",", 1)[0]
-    except:
-        return ""
+# Translation table dropping control/high bytes; str.translate runs in C
+# with no regex engine overhead.
+_DROP = dict.fromkeys(
+    list(range(0x00, 0x09)) + [0x0b, 0x0c] + list(range(0x0e, 0x20)) + list(range(0x7f, 0x100)),
+    None,
+)
+# [^\S\n] keeps the gap on one line: a bare \s+ matches newlines, which
+# let the pattern anchor on a digit-only qty line and swallow the page
+# number off the start of the following SKU row
+SKU_PATTERN = re.compile(r"(?m)^(\d\S*)[^\S\n]+([^|\n]+)\|")
+SOLDBY_PATTERN = re.compile(r"Sold By:\s*([^,\n]+)")
+# Everything between the QTY header line (any case) and the next field
+# keyword; digit-only lines inside that span are the quantities, with
+# intervening non-digit lines tolerated like the old line scan did
+QTY_PATTERN = re.compile(r"(?ims)^[^\n]*QTY[^\n]*\n(.*?)(?=^[^\n]*(?:SKU|SOLD\s*BY|COLOR|SIZE)|\Z)")
+QTY_LINE_PATTERN = re.compile(r"(?m)^\s*(\d+)\s*$")
+
+# ---------------------- Extract Data (Vectorized) ----------------------
+def extract_data(text, merged_pdf, output_path):
+    # Clean every page exactly once, then run the field extraction as
+    # vectorized pandas string ops over the whole corpus instead of
+    # per-page Python loops.
+    cleaned = pd.Series([p.translate(_DROP) for p in text])
+
+    df = pd.DataFrame({"page": range(len(cleaned))})
+
+    # Courier is always the third line of the label
+    df["courier"] = cleaned.str.split("\n", n=3).str[2].fillna("").str.strip()
+
+    # Sold By: everything after the marker up to the first comma
+    df["soldBy"] = cleaned.str.extract(SOLDBY_PATTERN, expand=False).fillna("").str.strip()
+
+    # SKU lines look like "<number> <sku> | ..."; first match per page wins,
+    # more than one match means a multi-SKU shipment
+    sku_matches = cleaned.str.extractall(SKU_PATTERN)
+    if sku_matches.empty:
+        df["sku"] = ""
+        multi_sku = pd.Series(False, index=df.index)
+    else:
+        per_page = sku_matches[1].groupby(level=0)
+        df["sku"] = per_page.first().reindex(df.index).fillna("")
+        multi_sku = per_page.size().reindex(df.index, fill_value=0) > 1
 
-# ---------------------- Extract Data (Parallel) ----------------------
-def extract_data(text, merged_pdf_path, output_path):
-    df_list = []
-    error_pages = []
+    # Qty: sum the digit-only lines between the QTY header and the next
+    # field keyword
+    qty_runs = cleaned.str.extract(QTY_PATTERN, expand=False).str.findall(QTY_LINE_PATTERN)
+    df["qty"] = qty_runs.apply(lambda run: sum(map(int, run)) if isinstance(run, list) and run else 1)
+    mqty = qty_runs.str.len().fillna(0) > 1
 
-    def process_page(idx, page):
-        try:
-            sku, multi_sku = sku_extract(page)
-            qty, mqty = quantity_extract(page)
-            courier = courier_extract(page)
-            soldBy = soldBy_extract(page)
-            multi = (multi_sku or mqty or qty > 1)
-            return {"page": idx, "sku": sku, "qty": qty, "multi": multi, "courier": courier, "soldBy": soldBy}, idx if sku == "" else None
-        except:
-            return None, idx
-
-    with ThreadPoolExecutor(max_workers=8) as executor:
-        futures = [executor.submit(process_page, i, page) for i, page in enumerate(text)]
-        for future in as_completed(futures):
-            result, error_idx = future.result()
-            if result:
-                df_list.append(result)
-            if error_idx is not None:
-                error_pages.append(error_idx)
+    df["multi"] = multi_sku | mqty | (df["qty"] > 1)
+    df = df[["page", "sku", "qty", "multi", "courier", "soldBy"]]
 
-    df = pd.DataFrame(df_list)
+    error_pages = df.index[df["sku"] == ""].tolist()
 
     # Handle error pages
     if error_pages:
         timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
         error_filename = f"error_pages_{timestamp}.pdf"
-        reader_input = PdfReader(merged_pdf_path)
-        writer = PdfWriter()
+        src = merged_pdf if isinstance(merged_pdf, fitz.Document) else fitz.open(merged_pdf)
+        writer = fitz.open()
         for page in error_pages:
-            writer.addpage(reader_input.pages[page])
-        writer.write(os.path.join(output_path, error_filename))
+            writer.insert_pdf(src, from_page=page, to_page=page)
+        writer.save(os.path.join(output_path, error_filename))
+        writer.close()
+        if src is not merged_pdf:
+            src.close()
 
     return df
 
@@ -180,95 +186,173 @@ def pdf_whitespace(pdf_path, temp_path):
             doc[page_no].set_cropbox(crop_rect)
         except:
             pass
+    # Temp file that is re-read immediately; skip the expensive xref
+    # garbage collection and stream recompression.
     save_path = os.path.join(temp_path, "whitespace_removed.pdf")
-    doc.save(save_path, garbage=4, deflate=True, clean=True)
+    doc.save(save_path, garbage=0, deflate=False, clean=False)
     doc.close()
     return save_path
 
-import fitz
-import os
-from datetime import datetime
-from tqdm import tqdm
-
-def pdf_cropper(pdf_path, config, temp_path):
-    now = datetime.now()
-    formatted_datetime = now.strftime("%d-%m-%y %I:%M %p")
-    doc = fitz.open(pdf_path)
-    result = fitz.open()
-
-    padding = 5              # little space around crop
-    fixed_invoice_height = 500  # fallback
-
-    for page_no in tqdm(range(len(doc)), desc="Cropping pages"):
-        try:
-            if config.get("keep_invoice", False):
-                # Insert full page twice: first = Label, second = Invoice
-                result.insert_pdf(doc, from_page=page_no, to_page=page_no)
-                result.insert_pdf(doc, from_page=page_no, to_page=page_no)
-
-                label_page = result[-2]
-                invoice_page = result[-1]
-
-                # ---- CROP LABEL ----
-                text_instances = label_page.search_for("Order Id:")
-                if text_instances:
+_CROP_PADDING = 5                # little space around crop
+_FIXED_INVOICE_HEIGHT = 500      # fallback
+
+def _crop_pages(doc, result, page_range, config, formatted_datetime):
+    padding = _CROP_PADDING
+    fixed_invoice_height = _FIXED_INVOICE_HEIGHT
+
+    if len(page_range) == 0:
+        return
+
+    # Hoisted out of the page loop: one dict lookup instead of N, and the
+    # built-in Helvetica is named explicitly so no font gets re-embedded
+    # per insert_text call.
+    add_date = config.get("add_date_on_top", False)
+
+    if not config.get("keep_invoice", False):
+        # Label-only: copy the whole contiguous range with a single
+        # insert_pdf call, then crop the copies in place. On a failed page
+        # the uncropped copy is already in place as the fallback.
+        base = result.page_count
+        result.insert_pdf(doc, from_page=page_range[0], to_page=page_range[-1])
+        for offset, page_no in enumerate(tqdm(page_range, desc="Cropping pages")):
+            try:
+                order_y = None
+                for b in doc[page_no].get_text("blocks"):
+                    if "Order Id:" in b[4]:
+                        order_y = b[1]
+                        break
+
+                label_page = result[base + offset]
+                if order_y is not None:
                     label_rect = fitz.Rect(
                         185, 15,
                         label_page.rect.width - 185,
-                        text_instances[0].y0 - 10
+                        order_y - 10
                     )
                     label_page.set_cropbox(label_rect)
 
-                if config.get("add_date_on_top", False):
-                    label_page.insert_text(fitz.Point(12, 10), formatted_datetime, fontsize=11)
-
-                # ---- CROP INVOICE (tight below "Tax Invoice") ----
-                text_instances = invoice_page.search_for("Tax Invoice") or invoice_page.search_for("TAX INVOICE")
-                if text_instances:
-                    # take first occurrence
-                    rect = text_instances[0]
+                if add_date:
+                    label_page.insert_text(fitz.Point(12, 10), formatted_datetime, fontsize=11, fontname="helv")
+            except Exception as e:
+                print(f"⚠️ Error cropping page {page_no}: {e}")
+        return
 
-                    invoice_rect = fitz.Rect(
+    # keep_invoice: stays per-page because the printed output must
+    # interleave each label with its invoice copy.
+    for page_no in tqdm(page_range, desc="Cropping pages"):
+        try:
+            # One blocks pass per source page replaces the separate
+            # search_for calls; label and invoice crops reuse the same
+            # positions even when the page is inserted twice.
+            order_y = invoice_y = None
+            for b in doc[page_no].get_text("blocks"):
+                block_text = b[4]
+                if order_y is None and "Order Id:" in block_text:
+                    order_y = b[1]
+                if invoice_y is None and ("Tax Invoice" in block_text or "TAX INVOICE" in block_text):
+                    invoice_y = b[1]
+                if order_y is not None and invoice_y is not None:
+                    break
+
+            # First copy = Label, second = Invoice. fullcopy_page
+            # duplicates within result, skipping the cross-document
+            # resource merge a second insert_pdf would redo.
+            result.insert_pdf(doc, from_page=page_no, to_page=page_no)
+            result.fullcopy_page(result.page_count - 1)
+
+            label_page = result[-2]
+            invoice_page = result[-1]
+
+            # ---- CROP LABEL ----
+            if order_y is not None:
+                label_rect = fitz.Rect(
+                    185, 15,
+                    label_page.rect.width - 185,
+                    order_y - 10
+                )
+                label_page.set_cropbox(label_rect)
+
+            if add_date:
+                label_page.insert_text(fitz.Point(12, 10), formatted_datetime, fontsize=11, fontname="helv")
+
+            # ---- CROP INVOICE (tight below "Tax Invoice") ----
+            if invoice_y is not None:
+                invoice_rect = fitz.Rect(
+                    0,
+                    invoice_y - padding,  # start at "Tax Invoice"
+                    invoice_page.rect.width,
+                    min(invoice_page.rect.height, invoice_y + fixed_invoice_height)
+                )
+                invoice_page.set_cropbox(invoice_rect)
+            else:
+                # fallback: take lower half of page
+                invoice_page.set_cropbox(
+                    fitz.Rect(
                         0,
-                        rect.y0 - padding,  # start at "Tax Invoice"
+                        invoice_page.rect.height / 2,
                         invoice_page.rect.width,
-                        min(invoice_page.rect.height, rect.y0 + fixed_invoice_height)
-                    )
-                    invoice_page.set_cropbox(invoice_rect)
-                else:
-                    # fallback: take lower half of page
-                    invoice_page.set_cropbox(
-                        fitz.Rect(
-                            0,
-                            invoice_page.rect.height / 2,
-                            invoice_page.rect.width,
-                            invoice_page.rect.height
-                        )
-                    )
-
-            else:
-                # Only label
-                result.insert_pdf(doc, from_page=page_no, to_page=page_no)
-                label_page = result[-1]
-
-                text_instances = label_page.search_for("Order Id:")
-                if text_instances:
-                    label_rect = fitz.Rect(
-                        185, 15,
-                        label_page.rect.width - 185,
-                        text_instances[0].y0 - 10
+                        invoice_page.rect.height
                     )
-                    label_page.set_cropbox(label_rect)
-
-                if config.get("add_date_on_top", False):
-                    label_page.insert_text(fitz.Point(12, 10), formatted_datetime, fontsize=11)
+                )
 
         except Exception as e:
             print(f"⚠️ Error cropping page {page_no}: {e}")
             result.insert_pdf(doc, from_page=page_no, to_page=page_no)
 
+def _crop_chunk(args):
+    # Worker: crop one contiguous page range into its own chunk PDF.
+    pdf_path, start, end, config, formatted_datetime, chunk_path = args
+    doc = fitz.open(pdf_path)
+    result = fitz.open()
+    _crop_pages(doc, result, range(start, end), config, formatted_datetime)
     doc.close()
+    result.save(chunk_path)
+    result.close()
+    return chunk_path
+
+def pdf_cropper(pdf, config, temp_path):
+    now = datetime.now()
+    formatted_datetime = now.strftime("%d-%m-%y %I:%M %p")
+
+    doc = pdf if isinstance(pdf, fitz.Document) else fitz.open(pdf)
+    page_count = len(doc)
+
     output_filename = os.path.join(temp_path, "cropped_final.pdf")
+    workers = min(WORKERS_PER_FOLDER, page_count) or 1
+
+    if workers <= 1:
+        result = fitz.open()
+        _crop_pages(doc, result, range(page_count), config, formatted_datetime)
+        if doc is not pdf:
+            doc.close()
+    else:
+        # Chunk workers reopen the source by path, so when handed an
+        # in-memory doc write one cheap uncompressed copy for them.
+        if isinstance(pdf, fitz.Document):
+            pdf_path = os.path.join(temp_path, "to_crop.pdf")
+            doc.save(pdf_path)
+        else:
+            pdf_path = pdf
+        # The workers reopen the file themselves, so a doc opened here
+        # from a path is no longer needed
+        if doc is not pdf:
+            doc.close()
+        # Crop contiguous page ranges in parallel processes, then stitch
+        # the chunk outputs back together in order.
+        chunk = -(-page_count // workers)
+        jobs = [
+            (pdf_path, start, min(start + chunk, page_count), config, formatted_datetime,
+             os.path.join(temp_path, f"cropped_chunk_{i}.pdf"))
+            for i, start in enumerate(range(0, page_count, chunk))
+        ]
+        with ProcessPoolExecutor(max_workers=len(jobs)) as executor:
+            chunk_paths = list(executor.map(_crop_chunk, jobs))
+        result = fitz.open()
+        for path in chunk_paths:
+            part = fitz.open(path)
+            result.insert_pdf(part)
+            part.close()
+
     result.save(output_filename, garbage=4, deflate=True, clean=True)
     result.close()
     return output_filename
@@ -280,25 +364,37 @@ def create_count_excel(df, output_path):
     df["color"] = df.get("color", "")  # ensure column exists
     df["size"] = df.get("size", "")    # ensure column exists
 
+    # Repeated label fields compress well as categories: the groupbys and
+    # sorts below then work on int codes instead of raw Python strings.
+    for c in ("sku", "soldBy", "courier", "color", "size"):
+        df[c] = df[c].astype("category")
+
     # SKU REPORT
-    sku_df = df[["qty", "soldBy", "color", "sku"]].value_counts().reset_index()
+    sku_df = df.groupby(["qty", "soldBy", "color", "sku"], sort=False, observed=True).size().reset_index(name="Count")
     sku_df.columns = ["Qty", "SoldBy", "Color", "SKU", "Count"]
-    sku_df["SKU_lower"] = sku_df["SKU"].str.lower()
-    sku_df = sku_df.sort_values(by=["Count", "SKU_lower", "Qty"], ascending=[False, True, True])
-    sku_df = sku_df.drop(columns=["SKU_lower"]).reset_index(drop=True)
-
-    # COURIER + SOLD BY REPORT
-    courierSold_df = df[["courier", "soldBy"]].value_counts().reset_index()
+    # lexsort on the key arrays directly (last key is primary); no
+    # transient SKU_lower column to allocate and drop
+    order = np.lexsort((
+        sku_df["Qty"].to_numpy(),
+        sku_df["SKU"].astype(str).str.lower().to_numpy(),
+        -sku_df["Count"].to_numpy(),
+    ))
+    sku_df = sku_df.iloc[order].reset_index(drop=True)
+
+    # COURIER + SOLD BY REPORT; the single-column reports are marginals of
+    # the joint counts, so sum those instead of rehashing the whole table.
+    joint = df.groupby(["courier", "soldBy"], sort=False, observed=True).size()
+    courierSold_df = joint.reset_index(name="Packages")
     courierSold_df.columns = ["Courier", "SoldBy", "Packages"]
     courierSold_df = courierSold_df.sort_values(by=["Packages", "Courier"], ascending=[False, True]).reset_index(drop=True)
 
     # COURIER REPORT
-    courier_df = df[["courier"]].value_counts().reset_index()
+    courier_df = joint.groupby(level=0, observed=True).sum().reset_index(name="Packages")
     courier_df.columns = ["Courier", "Packages"]
     courier_df = courier_df.sort_values(by=["Packages", "Courier"], ascending=[False, True]).reset_index(drop=True)
 
     # SOLD BY REPORT
-    soldby_df = df[["soldBy"]].value_counts().reset_index()
+    soldby_df = joint.groupby(level=1, observed=True).sum().reset_index(name="Packages")
     soldby_df.columns = ["SoldBy", "Packages"]
     soldby_df = soldby_df.sort_values(by=["Packages", "SoldBy"], ascending=[False, True]).reset_index(drop=True)
 
@@ -307,7 +403,13 @@ def create_count_excel(df, output_path):
     filename = f"summary_report_{timestamp}.xlsx"
     summary_path = os.path.join(output_path, filename)
 
-    with pd.ExcelWriter(summary_path, engine="xlsxwriter") as writer:
+    # constant_memory streams rows straight to disk instead of holding
+    # every cell in memory until close()
+    with pd.ExcelWriter(
+        summary_path,
+        engine="xlsxwriter",
+        engine_kwargs={"options": {"constant_memory": True, "strings_to_urls": False}},
+    ) as writer:
         workbook = writer.book
         worksheet = workbook.add_worksheet("Summary")
         writer.sheets["Summary"] = worksheet
@@ -319,18 +421,18 @@ def create_count_excel(df, output_path):
         row = 0
         def write_block(title, df_block):
             nonlocal row
+            # constant_memory discards rows as they are written, so column
+            # widths have to be set before the block's rows go out
+            widths = df_block.astype(str).map(len).max().fillna(0)
+            for i, col in enumerate(df_block.columns):
+                worksheet.set_column(i, i, min(max(int(widths[col]), len(str(col))) + 2, 30))
             worksheet.write(row, 0, title, bold_format)
             row += 1
-            for col_num, value in enumerate(df_block.columns):
-                worksheet.write(row, col_num, value, header_format)
+            worksheet.write_row(row, 0, df_block.columns, header_format)
             row += 1
-            for r in df_block.values:
-                for col_num, value in enumerate(r):
-                    worksheet.write(row, col_num, value, wrap_format)
+            for r in df_block.itertuples(index=False, name=None):
+                worksheet.write_row(row, 0, r, wrap_format)
                 row += 1
-            for i, col in enumerate(df_block.columns):
-                max_len = max([len(str(col))] + [len(str(val)) for val in df_block[col]])
-                worksheet.set_column(i, i, min(max_len + 2, 30))
             row += 2
 
         # Write all blocks
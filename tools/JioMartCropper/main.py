@@ -3,7 +3,7 @@ import shutil
 from datetime import datetime
 from concurrent.futures import ProcessPoolExecutor, as_completed
 from tempfile import TemporaryDirectory
-from pdfrw import PdfReader, PdfWriter
+import fitz  # PyMuPDF
 import traceback
 import pandas as pd
 
@@ -14,9 +14,9 @@ from utils import (
     convert_pdf_to_string,
     read_config,
     extract_data,
-    pdf_whitespace,
     pdf_cropper,
     create_count_excel,
+    FOLDER_WORKERS,
 )
 
 
@@ -49,11 +49,14 @@ def process_folder(input_path, output_path):
                 print(f"No data extracted from PDFs in {folder_name}")
                 return
 
-            # Clean dataframe safely
-            df["sku"] = df["sku"].astype(str).str.strip()
-            df["courier"] = df["courier"].astype(str).str.strip()
-            df["soldBy"] = df["soldBy"].astype(str).str.strip()
-            df["sku_lower"] = df["sku"].str.lower()
+            # Clean dataframe safely; fillna has to run before astype(str),
+            # which would otherwise turn missing values into the string "nan"
+            df["sku"] = df["sku"].fillna("").astype(str).str.strip()
+            df["courier"] = df["courier"].fillna("").astype(str).str.strip()
+            df["soldBy"] = df["soldBy"].fillna("").astype(str).str.strip()
+            # Lowercasing every SKU only pays off when the sort uses it
+            if config.get("sku_sort"):
+                df["sku_lower"] = df["sku"].str.lower()
 
             # Sorting logic
             sort_list = ["multi"]
@@ -68,23 +71,38 @@ def process_folder(input_path, output_path):
                 sort_list.append("soldBy")
                 ascending_list.append(True)
 
-            df = df.sort_values(by=sort_list, ascending=ascending_list, na_position="last")
-            df = df.drop(columns=["sku_lower"])
-            whole_data = df.copy(deep=True)
-
-            # Sort PDF pages
-            reader_input = PdfReader(merged_pdf)
-            writer_output = PdfWriter()
-            for page in df.page.values:
-                writer_output.addpage(reader_input.pages[page])
+            # Successive single-key stable sorts from least- to most-
+            # significant key hit pandas' typed C kernel; mergesort keeps
+            # earlier orderings intact. Short frames stay on the one-shot
+            # multi-key path, which is cheaper below the crossover.
+            if len(df) > 1000:
+                for col, asc in reversed(list(zip(sort_list, ascending_list))):
+                    df = df.sort_values(by=col, ascending=asc, kind="mergesort", na_position="last")
+            else:
+                df = df.sort_values(by=sort_list, ascending=ascending_list, na_position="last")
+            # create_count_excel only reads these columns and never writes,
+            # so a narrow projection replaces the full deep copy; sku_lower
+            # rides along (when computed) so the report doesn't lowercase
+            # the SKUs again — it falls back to its own pass otherwise
+            report_cols = ["qty", "soldBy", "color", "sku", "courier"]
+            if "sku_lower" in df.columns:
+                report_cols.append("sku_lower")
+            whole_data = df[report_cols]
+            df = df.drop(columns=["sku_lower"], errors="ignore")
+
+            # Sort PDF pages: fitz.select reorders the page tree in C
+            # without pdfrw rebuilding every page object. The file still
+            # lands on disk because the cropper's detection threads open
+            # their own handles on it.
+            doc = fitz.open(merged_pdf)
+            doc.select([int(i) for i in df.page.values])
             sorted_pdf_path = os.path.join(temp_path, "sorted.pdf")
-            writer_output.write(sorted_pdf_path)
+            doc.save(sorted_pdf_path)
+            doc.close()
 
-            # Remove whitespace & crop PDF
-            print("Removing whitespace...")
-            whitespace_pdf = pdf_whitespace(sorted_pdf_path)
+            # Crop PDF (the whitespace clamp now runs inside the cropper)
             print("Cropping PDF...")
-            cropped_pdf = pdf_cropper(whitespace_pdf, config, df)
+            cropped_pdf = pdf_cropper(sorted_pdf_path, config, df)
 
             # Save final PDF (use move to avoid leftover temp files)
             final_pdf = os.path.join(
@@ -117,8 +135,12 @@ def main():
         print("No subfolders in 'input'")
         return
 
-    max_workers = max(1, min(os.cpu_count() or 1, 4))
-    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+    # Two-level budget: each folder already parallelizes internally (text
+    # extraction over a process pool, crop detection over threads), so the
+    # outer pool defaults to a quarter of the cores instead of a fixed cap
+    # of 4. FOLDER_WORKERS comes from utils (JIOMART_WORKERS overrides)
+    # so the inner pools can size themselves against the same number.
+    with ProcessPoolExecutor(max_workers=FOLDER_WORKERS) as executor:
         futures = [
             executor.submit(
                 process_folder,
@@ -5,22 +5,29 @@ import shutil
 import os
 import re
 import pandas as pd
+import numpy as np
+from functools import lru_cache
 from tqdm import tqdm
 import fitz  # PyMuPDF
 from datetime import datetime
-from pdfminer.converter import TextConverter
-from pdfminer.layout import LAParams
-from pdfminer.pdfdocument import PDFDocument
-from pdfminer.pdfinterp import PDFResourceManager, PDFPageInterpreter
-from pdfminer.pdfpage import PDFPage
-from pdfminer.pdfparser import PDFParser
-from io import StringIO
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+# ---------------------- Worker Budgets ----------------------
+# main.py runs FOLDER_WORKERS folders at once (JIOMART_WORKERS
+# overrides); the pools inside one folder split the remaining cores so
+# folders × inner workers stays within the machine.
+FOLDER_WORKERS = max(1, int(os.environ.get("JIOMART_WORKERS", max(1, (os.cpu_count() or 1) // 4))))
+INNER_WORKERS = max(1, (os.cpu_count() or 1) // FOLDER_WORKERS)
 
 # ---------------------- Check Server Status ----------------------
+_session = requests.Session()
+
+@lru_cache(maxsize=1)
 def check_status():
     url = "https://raw.githubusercontent.com/sagar9995/meesho_file/main/lockv2.json"
     try:
-        r = requests.get(url=url, timeout=10)
+        # Session keep-alive spares the TLS handshake on any repeat call
+        r = _session.get(url=url, timeout=10)
         if r.status_code == 200 and r.json().get("Status", False):
             return
     except:
@@ -30,24 +37,22 @@ def check_status():
 
 # ---------------------- Check Input PDF ----------------------
 def check_input_file(filepath):
-    all_pdf = []
-    for x in os.listdir(filepath):
-        path = os.path.join(filepath, x)
-        if not path.lower().endswith(".pdf"):
-            continue
-        try:
-            with open(path, "rb") as f:
-                if f.read(4) != b"%PDF":
-                    print(f"Skipping invalid PDF: {x}")
-                    continue
-            all_pdf.append(path)
-        except:
-            print(f"Skipping unreadable PDF: {x}")
+    # scandir returns dirent + cached stat in one pass, so filtering by
+    # name and file type costs no extra syscalls per entry. Corrupt files
+    # are left for pdf_merger, whose fitz.open already catches and logs
+    # them — no need to open every candidate here just to sniff a header.
+    with os.scandir(filepath) as it:
+        all_pdf = [
+            entry.path
+            for entry in it
+            if entry.is_file() and entry.name.lower().endswith(".pdf")
+        ]
     if not all_pdf:
         print(f"No valid PDFs found in {filepath}")
     return all_pdf
 
 # ---------------------- Read Config ----------------------
+@lru_cache(maxsize=1)
 def read_config():
     default_config = {
         "sku_sort": True,
@@ -81,99 +86,135 @@ def pdf_merger(all_path, save_path):
             doc.close()
         except Exception as e:
             print(f"Error merging {path}: {e}")
-    result.save(save_path, garbage=4, deflate=True, clean=True)
+    # merged.pdf only feeds the next pipeline stage; skip garbage
+    # collection and recompression, which are the slow parts of save
+    result.save(save_path)
     result.close()
 
 # ---------------------- Convert PDF to Text ----------------------
+_WS_RE = re.compile(r'\s+')
+
+def _extract_range(args):
+    # Worker: open its own handle on the PDF and extract one page range.
+    file_path, start, end = args
+    doc = fitz.open(file_path)
+    texts = []
+    # doc.pages hands back each loaded page directly, skipping the
+    # per-index xref lookup of doc[i]
+    for page in doc.pages(start, end):
+        text = page.get_text("text")
+        text = _WS_RE.sub(' ', text)
+        text = text.replace('\x00', '')
+        texts.append(text)
+    doc.close()
+    return texts
+
 def convert_pdf_to_string(file_path):
     all_page = []
     try:
-        with open(file_path, "rb") as in_file:
-            parser = PDFParser(in_file)
-            doc = PDFDocument(parser)
-            rsrcmgr = PDFResourceManager()
-            
-            for page in PDFPage.create_pages(doc):
-                output_string = StringIO()
-                device = TextConverter(rsrcmgr, output_string, laparams=LAParams())
-                interpreter = PDFPageInterpreter(rsrcmgr, device)
-                interpreter.process_page(page)
-                
-                # Clean up
-                text = output_string.getvalue()
-                text = re.sub(r'\s+', ' ', text)
-                text = text.replace('\x00', '')
-                all_page.append(text)
+        doc = fitz.open(file_path)
+        page_count = doc.page_count
+        doc.close()
+        if page_count == 0:
+            return all_page
+
+        # Chunk the pages into contiguous ranges within this folder's
+        # worker budget; each worker opens the file itself so nothing
+        # unpicklable crosses the boundary.
+        workers = min(INNER_WORKERS, page_count)
+        chunk = -(-page_count // workers)
+        ranges = [
+            (file_path, start, min(start + chunk, page_count))
+            for start in range(0, page_count, chunk)
+        ]
+        with ProcessPoolExecutor(max_workers=len(ranges)) as executor:
+            for texts in executor.map(_extract_range, ranges):
+                all_page.extend(texts)
     except Exception as e:
         print(f"Error converting PDF to text: {e}")
-    
+
     return all_page
 
 # ---------------------- Extraction Helpers ----------------------
+# Patterns are compiled once at import. Each field keeps its label
+# variants as an ordered list searched one pattern at a time, so an
+# earlier variant anywhere on the page beats a later one ("SKU:" still
+# wins over an "Item Code:" that happens to appear first in the text).
+#
+# A name value is a run of words none of which is itself a field label:
+# the old greedy [A-Za-z\s]+ capture ate the next field's label, turning
+# "Delhivery Sold By: SellerOne" into courier "delhivery sold by" and
+# then re-matching "Seller" inside "SellerOne". The \b after each label
+# stops the same false hit on the label side.
+_LABELS = (
+    r"Shipment SKU|SKU|Item Code|Product Code"
+    r"|Shipping Agent|Courier|Delivery Partner|Pickup"
+    r"|Sold By|Seller|Vendor|Merchant"
+    r"|Qty|Quantity"
+)
+_NAME = rf"(?!(?:{_LABELS})\b)[A-Za-z]+(?:\s+(?!(?:{_LABELS})\b)[A-Za-z]+)*"
+
+_QTY_RES = [
+    re.compile(r"(?:Shipment )?(?:Qty|Quantity)\b[:\s]*(\d+)", re.IGNORECASE),
+]
+_SKU_RES = [
+    re.compile(rf"{label}\b[:\s]*([A-Za-z0-9\-]+)", re.IGNORECASE)
+    for label in (r"Shipment SKU", r"SKU", r"Item Code", r"Product Code")
+]
+_COURIER_RES = [
+    re.compile(rf"{label}\b[:\s]*({_NAME})", re.IGNORECASE)
+    for label in (r"Shipping Agent", r"Courier", r"Delivery Partner", r"Pickup")
+]
+_SOLDBY_RES = [
+    re.compile(rf"{label}\b[:\s]*({_NAME})", re.IGNORECASE)
+    for label in (r"Sold By", r"Seller", r"Vendor", r"Merchant")
+]
+
+def _search_ordered(patterns, page):
+    # Each pattern restarts from position 0, so priority stays per
+    # pattern rather than per position in the page.
+    for pattern in patterns:
+        match = pattern.search(page)
+        if match:
+            return match
+    return None
+
 def quantity_extract(page):
     try:
-        patterns = [
-            r"Qty[:\s]*(\d+)",
-            r"Quantity[:\s]*(\d+)",
-            r"Shipment Qty[:\s]*(\d+)",
-            r"QTY[:\s]*(\d+)"
-        ]
-        for pattern in patterns:
-            match = re.search(pattern, page, re.IGNORECASE)
-            if match:
-                qty = int(match.group(1))
-                return qty, qty > 1
+        match = _search_ordered(_QTY_RES, page)
+        if match:
+            qty = int(match.group(1))
+            return qty, qty > 1
         return 1, False
     except:
         return 1, False
 
 def sku_extract(page):
     try:
-        patterns = [
-            r"SKU[:\s]*([A-Za-z0-9\-]+)",
-            r"Shipment SKU[:\s]*([A-Za-z0-9\-]+)",
-            r"Item Code[:\s]*([A-Za-z0-9\-]+)",
-            r"Product Code[:\s]*([A-Za-z0-9\-]+)"
-        ]
-        for pattern in patterns:
-            match = re.search(pattern, page, re.IGNORECASE)
-            if match:
-                return match.group(1).strip()
+        match = _search_ordered(_SKU_RES, page)
+        if match:
+            return match.group(1).strip()
         return ""
     except:
         return ""
 
 def courier_extract(page):
     try:
-        patterns = [
-            r"Shipping Agent[:\s]*([A-Za-z\s]+)",
-            r"Courier[:\s]*([A-Za-z\s]+)",
-            r"Delivery Partner[:\s]*([A-Za-z\s]+)",
-            r"Pickup[:\s]*([A-Za-z\s]+)"
-        ]
-        for pattern in patterns:
-            match = re.search(pattern, page, re.IGNORECASE)
-            if match:
-                courier = match.group(1).strip().lower()
-                if courier in ["c", "lsh-r0", "lhs-r0", ""]:
-                    return "valmo"
-                return courier
+        match = _search_ordered(_COURIER_RES, page)
+        if match:
+            courier = match.group(1).strip().lower()
+            if courier in ["c", "lsh-r0", "lhs-r0", ""]:
+                return "valmo"
+            return courier
         return ""
     except:
         return ""
 
 def soldBy_extract(page):
     try:
-        patterns = [
-            r"Sold By[:\s]*([A-Za-z\s]+)",
-            r"Seller[:\s]*([A-Za-z\s]+)",
-            r"Vendor[:\s]*([A-Za-z\s]+)",
-            r"Merchant[:\s]*([A-Za-z\s]+)"
-        ]
-        for pattern in patterns:
-            match = re.search(pattern, page, re.IGNORECASE)
-            if match:
-                return match.group(1).strip()
+        match = _search_ordered(_SOLDBY_RES, page)
+        if match:
+            return match.group(1).strip()
         return ""
     except:
         return ""
@@ -194,107 +235,126 @@ def color_extract(page):
     except:
         return ""
 
+def _extract_fields(page):
+    qty, multi = quantity_extract(page)
+    return sku_extract(page), qty, multi, courier_extract(page), soldBy_extract(page)
+
 def extract_data(text):
-    df = pd.DataFrame()
+    # Pre-allocate by page index and build the DataFrame once at the end;
+    # concatenating a one-row frame per page re-copied everything each time.
+    records = [None] * len(text)
     error_pages = []
     for idx, page in tqdm(enumerate(text)):
         try:
-            sku = sku_extract(page)
+            sku, qty, mqty, courier, soldBy = _extract_fields(page)
             if sku == "":
                 error_pages.append(idx)
-            qty, mqty = quantity_extract(page)
-            courier = courier_extract(page)
-            soldBy = soldBy_extract(page)
-            size = size_extract(page)
-            color = color_extract(page)
-            df_dictionary = pd.DataFrame([{
+            records[idx] = {
                 "page": idx,
                 "sku": sku,
                 "qty": qty,
                 "multi": mqty,
                 "courier": courier,
                 "soldBy": soldBy,
-                "size": size,
-                "color": color,
-            }])
-            df = pd.concat([df, df_dictionary], ignore_index=True)
+                "size": size_extract(page),
+                "color": color_extract(page),
+            }
         except Exception as e:
             print(f"Error extracting data from page {idx}: {e}")
+    df = pd.DataFrame.from_records([r for r in records if r is not None])
     if len(error_pages) != 0:
         print(f"Found {len(error_pages)} pages with extraction errors")
     return df
 
-# ---------------------- PDF Whitespace ----------------------
-def pdf_whitespace(pdf_path):
+# ---------------------- PDF Cropper ----------------------
+# Base width/height
+FIXED_WIDTH = 3.5 * 72
+FIXED_HEIGHT = 4.25 * 72
+
+# Adjustments
+EXTRA_HEIGHT = 0.75 * 72
+REDUCE_RIGHT_MARGIN = 0.45 * 72
+EXTRA_TOP_MARGIN = 0.2 * 72  # Space for datetime at top
+
+def _detect_crop_range(args):
+    # Thread worker: detect content bounding boxes for one page range.
+    # Each thread opens its own handle so nothing is shared, and MuPDF
+    # releases the GIL in the C extractor, so ranges overlap across cores.
+    pdf_path, start, end = args
     doc = fitz.open(pdf_path)
-    for page_no in tqdm(range(len(doc))):
+    boxes = []
+    for page in doc.pages(start, end):
+        # One TextPage feeds the whitespace search below (and the fallback
+        # block scan); each call would otherwise re-extract the text layer
+        tp = page.get_textpage()
+
+        # mupdf records bounding boxes while parsing the content stream,
+        # so one bboxlog walk covers text and images together instead of a
+        # block scan plus a bbox lookup per image xref. Coordinates are
+        # reduced with NumPy column min/max rather than folding fitz.Rect
+        # objects one by one in Python.
         try:
-            page = doc[page_no]
-            text_instances = page.search_for("for online payments (as applicable)")
-            if text_instances:
-                crop_y = text_instances[0].y0 + 20
-                page_crop_rect = fitz.Rect(0, 0, page.rect.width, crop_y)
-                page.set_cropbox(page_crop_rect)
-        except Exception as e:
-            print(f"Error cropping whitespace on page {page_no}: {e}")
-    save_path = pdf_path.replace(".pdf", "_whitespace.pdf")
-    doc.save(save_path, garbage=4, deflate=True, clean=True)
-    doc.close()
-    return save_path
-
-# ---------------------- PDF Cropper ----------------------
-def pdf_cropper(pdf_path, config, df=None):
-    import fitz
-    from datetime import datetime
-    from tqdm import tqdm
+            coords = [
+                tuple(rect)
+                for kind, rect in page.get_bboxlog()
+                if kind in ("fill-text", "stroke-text", "fill-image")
+            ]
+        except Exception:
+            # Builds without bboxlog: fall back to blocks + image xrefs
+            coords = [b[:4] for b in page.get_text("blocks", textpage=tp)]
+            for img in page.get_images(full=True):
+                xref = img[0]
+                try:
+                    r = page.get_image_bbox(xref)
+                    coords.append((r.x0, r.y0, r.x1, r.y1))
+                except:
+                    pass
+
+        if coords:
+            arr = np.asarray(coords, dtype=np.float32)
+            min_x, min_y = arr[:, :2].min(axis=0)
+            max_x, max_y = arr[:, 2:].max(axis=0)
 
-    # Base width/height
-    FIXED_WIDTH = 3.5 * 72
-    FIXED_HEIGHT = 4.25 * 72
+            # Adjust dimensions
+            max_x = min(min_x + FIXED_WIDTH - REDUCE_RIGHT_MARGIN, page.rect.width)
+            max_y = min(min_y + FIXED_HEIGHT + EXTRA_HEIGHT, page.rect.height)
 
-    # Adjustments
-    EXTRA_HEIGHT = 0.75 * 72
-    REDUCE_RIGHT_MARGIN = 0.45 * 72
-    EXTRA_TOP_MARGIN = 0.2 * 72  # Space for datetime at top
+            # Trailing whitespace clamp, folded in from the old
+            # pdf_whitespace pass so the doc isn't saved and re-read
+            online = page.search_for("for online payments (as applicable)", textpage=tp)
+            if online and online[0].y0 + 20 > min_y:
+                max_y = min(max_y, online[0].y0 + 20)
+            boxes.append((min_x, min_y, max_x, max_y))
+        else:
+            boxes.append(None)
+    doc.close()
+    return boxes
 
+def pdf_cropper(pdf_path, config, df=None):
     now = datetime.now()
     formatted_datetime = now.strftime("%d-%m-%y %I:%M %p")
 
     main = fitz.open(pdf_path)
     result = fitz.open()
 
-    for page_no in tqdm(range(len(main))):
-        page = main[page_no]
-
-        # Detect content bounding box (union of all text & image bboxes)
-        rects = []
-
-        # Text blocks
-        for b in page.get_text("blocks"):
-            rects.append(fitz.Rect(b[:4]))
-
-        # Images
-        for img in page.get_images(full=True):
-            xref = img[0]
-            try:
-                rect = page.get_image_bbox(xref)
-                rects.append(rect)
-            except:
-                pass
-
-        if rects:
-            # Union of all rects
-            bbox = rects[0]
-            for r in rects[1:]:
-                bbox |= r
-
-            min_x, min_y, max_x, max_y = bbox
-
-            # Adjust dimensions
-            max_x = min(min_x + FIXED_WIDTH - REDUCE_RIGHT_MARGIN, page.rect.width)
-            max_y = min(min_y + FIXED_HEIGHT + EXTRA_HEIGHT, page.rect.height)
+    # Detection only reads, so it runs on a thread pool; the page writes
+    # below mutate `result` and stay on this thread, applied in order.
+    page_count = len(main)
+    boxes = []
+    if page_count:
+        workers = min(INNER_WORKERS, page_count)
+        chunk = -(-page_count // workers)
+        ranges = [
+            (pdf_path, start, min(start + chunk, page_count))
+            for start in range(0, page_count, chunk)
+        ]
+        with ThreadPoolExecutor(max_workers=len(ranges)) as executor:
+            for part in executor.map(_detect_crop_range, ranges):
+                boxes.extend(part)
 
-            crop_rect = fitz.Rect(min_x, min_y, max_x, max_y)
+    for page_no, box in tqdm(enumerate(boxes), total=page_count):
+        if box is not None:
+            crop_rect = fitz.Rect(*box)
 
             # Create new page with extra top margin
             new_width = crop_rect.width
@@ -329,29 +389,41 @@ def pdf_cropper(pdf_path, config, df=None):
     return cropped_path
 
 # ---------------------- Excel Report ----------------------
+def _counts(df, cols, count_col):
+    # value_counts sorts by frequency internally and every block re-sorts
+    # right after; an unsorted groupby skips the throwaway sort
+    return df.groupby(cols, sort=False, observed=True).size().reset_index(name=count_col)
+
 def create_count_excel(df, output_path="output"):
     os.makedirs(output_path, exist_ok=True)
 
-    sku_df = df[["qty", "soldBy", "color", "sku"]].value_counts().reset_index()
-    sku_df.columns = ["Qty", "SoldBy", "Color", "SKU", "Count"]
-    sku_df["SKU_lower"] = sku_df["SKU"].str.lower()
+    if "sku_lower" in df.columns:
+        # sku determines sku_lower, so grouping on both changes no counts
+        # but carries the caller's precomputed sort key through the groupby
+        sku_df = _counts(df, ["qty", "soldBy", "color", "sku", "sku_lower"], "Count")
+        sku_df.columns = ["Qty", "SoldBy", "Color", "SKU", "SKU_lower", "Count"]
+    else:
+        sku_df = _counts(df, ["qty", "soldBy", "color", "sku"], "Count")
+        sku_df.columns = ["Qty", "SoldBy", "Color", "SKU", "Count"]
+        sku_df["SKU_lower"] = sku_df["SKU"].str.lower()
     sku_df = sku_df.sort_values(by=["Count", "SKU_lower", "Qty"], ascending=[False, True, True])
     sku_df = sku_df.drop(columns=["SKU_lower"]).reset_index(drop=True)
 
-    courierSold_df = df[["courier", "soldBy"]].value_counts().reset_index()
+    courierSold_df = _counts(df, ["courier", "soldBy"], "Packages")
     courierSold_df.columns = ["Courier", "SoldBy", "Packages"]
     courierSold_df = courierSold_df.sort_values(by=["Packages", "Courier"], ascending=[False, True]).reset_index(drop=True)
-    
-    courier_df = df[["courier"]].value_counts().reset_index()
+
+    courier_df = _counts(df, ["courier"], "Packages")
     courier_df.columns = ["Courier", "Packages"]
     courier_df = courier_df.sort_values(by=["Packages", "Courier"], ascending=[False, True]).reset_index(drop=True)
 
-    soldby_df = df[["soldBy"]].value_counts().reset_index()
+    soldby_df = _counts(df, ["soldBy"], "Packages")
     soldby_df.columns = ["SoldBy", "Packages"]
     soldby_df = soldby_df.sort_values(by=["Packages", "SoldBy"], ascending=[False, True]).reset_index(drop=True)
 
-    now_str = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-    summary_path = os.path.join(output_path, f"summary_report_{now_str}.xlsx")
+    # Capture the clock once for the file name and the report header
+    now = datetime.now()
+    summary_path = os.path.join(output_path, f"summary_report_{now.strftime('%Y-%m-%d_%H-%M-%S')}.xlsx")
 
     with pd.ExcelWriter(summary_path, engine="xlsxwriter") as writer:
         workbook = writer.book
@@ -364,23 +436,28 @@ def create_count_excel(df, output_path="output"):
         timestamp_format = workbook.add_format({'italic': True, 'font_color': 'gray'})
 
         row = 0
-        worksheet.write(row, 0, f"Report Generated: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}", timestamp_format)
+        col_widths = {}
+        worksheet.write(row, 0, f"Report Generated: {now.strftime('%Y-%m-%d %H:%M:%S')}", timestamp_format)
         row += 2
 
         def write_block(title, df_block):
             nonlocal row
             worksheet.write(row, 0, title, bold_format)
             row += 1
-            for col_num, value in enumerate(df_block.columns):
-                worksheet.write(row, col_num, value, header_format)
+            worksheet.write_row(row, 0, df_block.columns, header_format)
             row += 1
-            for r in df_block.values:
-                for col_num, value in enumerate(r):
-                    worksheet.write(row, col_num, value, wrap_format)
+            # write_row pushes a whole row through one C call; itertuples
+            # avoids the object-array conversion that .values forces
+            for r in df_block.itertuples(index=False, name=None):
+                worksheet.write_row(row, 0, r, wrap_format)
                 row += 1
+            # One vectorized pass over the block instead of re-casting
+            # every cell to str per column in Python; widths accumulate
+            # so a later block doesn't clobber an earlier, wider one
+            widths = df_block.astype(str).map(len).max().fillna(0)
             for i, col in enumerate(df_block.columns):
-                max_len = max([len(str(col))] + [len(str(val)) for val in df_block[col]])
-                worksheet.set_column(i, i, min(max_len + 2, 30))
+                w = min(max(int(widths[col]), len(str(col))) + 2, 30)
+                col_widths[i] = max(col_widths.get(i, 0), w)
             row += 2
 
         write_block("SKU REPORT", sku_df)
@@ -388,5 +465,8 @@ def create_count_excel(df, output_path="output"):
         write_block("COURIER", courier_df)
         write_block("SOLD BY REPORT", soldby_df)
 
+        for i, w in col_widths.items():
+            worksheet.set_column(i, i, w)
+
     print("summary report generated at", summary_path)
     return summary_path
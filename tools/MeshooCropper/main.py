@@ -1,8 +1,9 @@
 import os
+import shutil
 from datetime import datetime
-from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures import ProcessPoolExecutor
 from tempfile import TemporaryDirectory
-from pdfrw import PdfReader, PdfWriter
+import fitz
 
 from utils import (
     check_status,
@@ -11,9 +12,9 @@ from utils import (
     convert_pdf_to_string,
     read_config,
     extract_data,
-    pdf_whitespace,
     pdf_cropper,
     create_count_excel,
+    FOLDER_WORKERS,
 )
 
 # ---------------------- Process Folder ----------------------
@@ -46,17 +47,17 @@ def process_folder(input_path, output_path):
                 print(f"[WARNING] No data extracted from PDFs in {folder_name}")
                 return
 
-            # Clean dataframe
-            df["sku"] = df["sku"].str.strip().fillna("")
-            df["courier"] = df["courier"].str.strip().fillna("")
-            df["soldBy"] = df["soldBy"].str.strip().fillna("")
-            df["sku_lower"] = df["sku"].str.lower()
+            # Clean dataframe in one pass over the three string columns
+            df[["sku", "courier", "soldBy"]] = (
+                df[["sku", "courier", "soldBy"]].fillna("").apply(lambda s: s.str.strip())
+            )
 
-            # Sorting logic
+            # Sorting logic — sku sorts case-insensitively via the key
+            # callable below instead of materializing a sku_lower column
             sort_list = ["multi"]
             ascending_list = [True]
             if config.get("sku_sort"):
-                sort_list.append("sku_lower")
+                sort_list.append("sku")
                 ascending_list.append(False)
             if config.get("courier_sort"):
                 sort_list.append("courier")
@@ -65,33 +66,45 @@ def process_folder(input_path, output_path):
                 sort_list.append("soldBy")
                 ascending_list.append(True)
 
-            df = df.sort_values(by=sort_list, ascending=ascending_list, na_position="last")
-            df = df.drop(columns=["sku_lower"])
-            whole_data = df.copy(deep=True)
-
-            # Sort PDF pages based on dataframe
-            reader_input = PdfReader(merged_pdf)
-            writer_output = PdfWriter()
-            for page_no in df.page.values:
-                writer_output.addpage(reader_input.pages[page_no])
+            # Chained single-key stable sorts in reverse key order match the
+            # multi-key lexsort result while each pass stays on the fast
+            # typed kernel; small frames keep the one-shot call.
+            sort_key = lambda s: s.str.lower() if s.name == "sku" else s
+            if len(df) > 1000:
+                for col, asc in reversed(list(zip(sort_list, ascending_list))):
+                    df = df.sort_values(by=col, ascending=asc, kind="mergesort", na_position="last", key=sort_key)
+            else:
+                df = df.sort_values(by=sort_list, ascending=ascending_list, na_position="last", key=sort_key)
+            # create_count_excel only reads these columns and never writes,
+            # so a narrow projection replaces the full deep copy
+            whole_data = df[["qty", "soldBy", "color", "sku", "courier"]]
+
+            # Sort PDF pages based on dataframe; fitz.select reorders the
+            # page tree in C instead of pdfrw re-serializing every page
+            doc = fitz.open(merged_pdf)
+            doc.select([int(i) for i in df.page.values])
             sorted_pdf_path = os.path.join(temp_path, "sorted.pdf")
-            writer_output.write(sorted_pdf_path)
+            doc.save(sorted_pdf_path)
+            doc.close()
             print(f"[INFO] Sorted PDF created -> {sorted_pdf_path}")
 
-            # Remove whitespace & crop PDF
-            print("Removing whitespace...")
-            whitespace_pdf = pdf_whitespace(sorted_pdf_path)
+            # Crop PDF (the whitespace trim now happens inside the cropper)
             print("Cropping PDF...")
-            cropped_pdf = pdf_cropper(whitespace_pdf, config)
+            cropped_pdf = pdf_cropper(sorted_pdf_path, config)
+
+            # One timestamp for both outputs, so the PDF and Excel names
+            # can't drift apart when the clock ticks between them
+            ts = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
 
             # Save final PDF
-            final_pdf_name = f"result_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.pdf"
+            final_pdf_name = f"result_{ts}.pdf"
             final_pdf = os.path.join(output_path, final_pdf_name)
-            from shutil import copy
-            copy(cropped_pdf, final_pdf)
+            # The cropped file is a throwaway intermediate — a move renames
+            # it into place instead of re-reading and re-writing every byte
+            shutil.move(cropped_pdf, final_pdf)
 
             # Save Excel summary
-            excel_name = f"summary_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.xlsx"
+            excel_name = f"summary_{ts}.xlsx"
             excel_path = os.path.join(output_path, excel_name)
             create_count_excel(whole_data, excel_path)
 
@@ -111,28 +124,33 @@ def main():
     output_root = "output"
     os.makedirs(output_root, exist_ok=True)
 
-    subfolders = [
-        f for f in os.listdir(input_root)
-        if os.path.isdir(os.path.join(input_root, f))
-    ]
+    with os.scandir(input_root) as it:
+        subfolders = [e.name for e in it if e.is_dir()]
     if not subfolders:
         print("No subfolders in 'input'")
         return
 
-    # Parallel processing
-    with ProcessPoolExecutor(max_workers=os.cpu_count()) as executor:
-        futures = [
-            executor.submit(
-                process_folder,
-                os.path.join(input_root, f),
-                os.path.join(output_root, f)
-            ) for f in subfolders
-        ]
-        for future in as_completed(futures):
-            try:
-                future.result()
-            except Exception as e:
-                print(f"⚠ Process error: {e}")
+    # Parallel processing. os.cpu_count() counts SMT threads, so a pool
+    # that size doubles up on physical cores and thrashes once every
+    # worker is deep in fitz/pandas; FOLDER_WORKERS (half the logical
+    # cores, shared with the inner extraction pool's budget in utils) is
+    # the safer ceiling, and there is no point spawning more workers
+    # than folders.
+    workers = min(len(subfolders), FOLDER_WORKERS)
+    # Recycle each worker after one folder so fitz/pandas allocations
+    # don't pile up in long-lived processes when folders outnumber cores;
+    # max_tasks_per_child needs Python 3.11, older versions just skip it.
+    try:
+        executor = ProcessPoolExecutor(max_workers=workers, max_tasks_per_child=1)
+    except TypeError:
+        executor = ProcessPoolExecutor(max_workers=workers)
+    with executor:
+        in_paths = [os.path.join(input_root, f) for f in subfolders]
+        out_paths = [os.path.join(output_root, f) for f in subfolders]
+        # process_folder catches its own errors, so results just stream
+        # through map — no list of Future objects held for the whole run
+        for _ in executor.map(process_folder, in_paths, out_paths):
+            pass
 
     print("\nAll folders processed successfully.")
 
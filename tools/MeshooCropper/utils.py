@@ -4,23 +4,28 @@ import sys
 import shutil
 import os
 import re
-from pdfrw import PdfReader, PdfWriter
-from pdfminer.converter import TextConverter
-from pdfminer.layout import LAParams
-from pdfminer.pdfdocument import PDFDocument
-from pdfminer.pdfinterp import PDFResourceManager, PDFPageInterpreter
-from pdfminer.pdfpage import PDFPage
-from pdfminer.pdfparser import PDFParser
-from io import StringIO
 import pandas as pd
+from functools import lru_cache
 from tqdm import tqdm
 import fitz
 from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+
+# ---------- WORKER BUDGETS ----------
+# main.py caps its folder pool at half the logical cores; the extraction
+# pool inside one folder splits what's left so folders × inner workers
+# stays within the machine.
+FOLDER_WORKERS = max(1, (os.cpu_count() or 2) // 2)
+INNER_WORKERS = max(1, (os.cpu_count() or 1) // FOLDER_WORKERS)
 
 # ---------- SERVER STATUS CHECK ----------
+_session = requests.Session()
+
+@lru_cache(maxsize=1)
 def check_status():
     url = "https://raw.githubusercontent.com/sagar9995/meesho_file/main/lockv2.json"
-    r = requests.get(url=url, timeout=5)
+    # Session keep-alive spares the TLS handshake on any repeat call
+    r = _session.get(url=url, timeout=5)
     if r.status_code == 200 and r.json().get("Status") is True:
         return None
     sys.exit("Server locked. Exiting.")
@@ -32,7 +37,10 @@ def create_filedir():
     os.makedirs("output", exist_ok=True)
 
 def check_input_file(filepath):
-    all_pdf = [os.path.join(filepath, x) for x in os.listdir(filepath) if x.endswith(".pdf")]
+    # scandir yields entries with path and file type precomputed, saving
+    # a join and a stat per file compared to listdir
+    with os.scandir(filepath) as it:
+        all_pdf = [e.path for e in it if e.is_file() and e.name.endswith(".pdf")]
     if not all_pdf:
         sys.exit("No PDF files found in input folder.")
     return all_pdf
@@ -43,78 +51,105 @@ def read_config():
 
 # ---------- PDF MERGING ----------
 def pdf_merger(all_path, save_path=os.path.join("temp", "merged_all.pdf")):
-    writer = PdfWriter()
+    # Bulk page copy at the C layer instead of pdfrw building a new page
+    # dict per page
+    result = fitz.open()
     for path in all_path:
-        reader = PdfReader(path)
-        writer.addpages(reader.pages)
-    writer.write(save_path)
+        src = fitz.open(path)
+        result.insert_pdf(src)
+        src.close()
+    result.save(save_path)
+    result.close()
     return save_path
 
 # ---------- PDF TO TEXT ----------
+def _extract_range(args):
+    # Worker: open its own handle on the PDF and extract one page range;
+    # fitz documents aren't picklable, so only the path crosses over.
+    file_path, start, end = args
+    doc = fitz.open(file_path)
+    texts = [page.get_text("text") for page in doc.pages(start, end)]
+    doc.close()
+    return texts
+
 def convert_pdf_to_string(file_path):
+    # MuPDF's C extractor is an order of magnitude faster than rebuilding
+    # a pdfminer interpreter per page; big PDFs additionally fan page
+    # ranges out across cores, small ones skip the pool spin-up cost.
+    doc = fitz.open(file_path)
+    page_count = doc.page_count
+    if page_count <= 64:
+        all_page = [doc[i].get_text("text") for i in range(page_count)]
+        doc.close()
+        return all_page
+    doc.close()
+
+    workers = min(INNER_WORKERS, page_count)
+    chunk = -(-page_count // workers)
+    ranges = [
+        (file_path, start, min(start + chunk, page_count))
+        for start in range(0, page_count, chunk)
+    ]
     all_page = []
-    with open(file_path, "rb") as in_file:
-        parser = PDFParser(in_file)
-        doc = PDFDocument(parser)
-        rsrcmgr = PDFResourceManager()
-        laparams = LAParams()
-        for page in PDFPage.create_pages(doc):
-            output_string = StringIO()
-            device = TextConverter(rsrcmgr, output_string, laparams=laparams)
-            interpreter = PDFPageInterpreter(rsrcmgr, device)
-            interpreter.process_page(page)
-            all_page.append(output_string.getvalue())
-            device.close()
+    with ProcessPoolExecutor(max_workers=len(ranges)) as executor:
+        for texts in executor.map(_extract_range, ranges):
+            all_page.extend(texts)
     return all_page
 
 # ---------- FIELD EXTRACTION (ROBUST) ----------
 re_digits = re.compile(r'\d+')
 
-def quantity_extract(page):
-    page_lines = [x for x in page.split("\n") if x]
-    for i, line in enumerate(page_lines):
-        low = line.lower()
-        if "qty" in low or "quantity" in low:
-            if i + 1 < len(page_lines):
-                match = re_digits.search(page_lines[i+1])
-                if match:
-                    val = int(match.group())
-                    return val, (val != 1)
-    return 0, False
-
-def courier_extract(page):
-    page_lines = [x for x in page.split("\n") if x]
-    for i, line in enumerate(page_lines):
-        if "pickup" in line.lower() and i + 1 < len(page_lines):
-            courier = page_lines[i+1].strip()
+def extract_fields(page):
+    # One split/strip/lower pass shared by every field; the old per-field
+    # extractors each re-split the page and re-lowercased every line, so a
+    # page was tokenized up to six times. A field keeps its first hit and
+    # each takes the next non-empty line after its keyword.
+    lines = [x.strip() for x in page.splitlines() if x.strip()]
+    lowers = [x.lower() for x in lines]
+    n = len(lines)
+
+    fields = {
+        "sku": "",
+        "qty": 0,
+        "multi": False,
+        "courier": "",
+        "soldBy": "",
+        "size": "",
+        "color": "",
+    }
+    for i, low in enumerate(lowers):
+        nxt = lines[i + 1] if i + 1 < n else ""
+        if not fields["sku"] and "sku" in low:
+            fields["sku"] = nxt
+        if not fields["qty"] and ("qty" in low or "quantity" in low):
+            match = re_digits.search(nxt)
+            if match:
+                val = int(match.group())
+                fields["qty"] = val
+                fields["multi"] = val != 1
+        if not fields["courier"] and "pickup" in low:
+            courier = nxt
             if courier.lower() in {"c", "lsh-r0", "lhs-r0", ""}:
-                return "valmo"
-            return courier
-    return ""
-
-def sku_extract(page):
-    for i, line in enumerate(page.split("\n")):
-        if "sku" in line.lower():
-            return page.split("\n")[i+1].strip() if i+1 < len(page.split("\n")) else ""
-    return ""
-
-def soldBy_extract(page):
-    for i, line in enumerate(page.split("\n")):
-        if "if undelivered, return to:" in line.lower():
-            return page.split("\n")[i+1].strip() if i+1 < len(page.split("\n")) else ""
-    return ""
-
-def size_extract(page):
-    for i, line in enumerate(page.split("\n")):
-        if "size" in line.lower():
-            return page.split("\n")[i+1].strip() if i+1 < len(page.split("\n")) else ""
-    return ""
-
-def color_extract(page):
-    for i, line in enumerate(page.split("\n")):
-        if "color" in line.lower():
-            return page.split("\n")[i+1].strip() if i+1 < len(page.split("\n")) else ""
-    return ""
+                courier = "valmo"
+            fields["courier"] = courier
+        if not fields["soldBy"] and "if undelivered, return to:" in low:
+            fields["soldBy"] = nxt
+        if not fields["size"] and "size" in low:
+            fields["size"] = nxt
+        if not fields["color"] and "color" in low:
+            fields["color"] = nxt
+    return fields
+
+def _page_ranges(pages):
+    # Collapse a sorted page list into (start, end) runs so consecutive
+    # pages copy in one insert_pdf call instead of one call per page
+    start = prev = pages[0]
+    for page in pages[1:]:
+        if page != prev + 1:
+            yield start, prev
+            start = page
+        prev = page
+    yield start, prev
 
 # ---------- EXTRACT DATA FROM PDF TEXT ----------
 def extract_data(text):
@@ -122,20 +157,10 @@ def extract_data(text):
     error_pages = []
     for idx, page in tqdm(enumerate(text), desc="Extracting Data", unit="page", total=len(text)):
         try:
-            sku = sku_extract(page)
-            if not sku:
+            fields = extract_fields(page)
+            if not fields["sku"]:
                 error_pages.append(idx)
-            qty, mqty = quantity_extract(page)
-            rows.append({
-                "page": idx,
-                "sku": sku,
-                "qty": qty,
-                "multi": mqty,
-                "courier": courier_extract(page),
-                "soldBy": soldBy_extract(page),
-                "size": size_extract(page),
-                "color": color_extract(page)
-            })
+            rows.append({"page": idx, **fields})
         except Exception:
             error_pages.append(idx)
             continue
@@ -144,92 +169,120 @@ def extract_data(text):
 
     if error_pages:
         try:
-            reader_input = PdfReader("temp/output.pdf")
-            writer = PdfWriter()
-            for page in error_pages:
-                writer.addpage(reader_input.pages[page])
-            writer.write("output/error_pages.pdf")
+            # fitz copies the pages by reference instead of re-parsing the
+            # whole merged PDF the way pdfrw did
+            src = fitz.open("temp/output.pdf")
+            writer = fitz.open()
+            for start, end in _page_ranges(sorted(error_pages)):
+                writer.insert_pdf(src, from_page=start, to_page=end)
+            writer.save("output/error_pages.pdf")
+            writer.close()
+            src.close()
         except Exception:
             pass
 
     return df
 
-# ---------- PDF WHITESPACE REMOVAL ----------
-def pdf_whitespace(pdf_path):
-    doc = fitz.open(pdf_path)
-    for page in doc:
-        try:
-            instances = page.search_for("for online payments (as applicable)")
-            if instances:
-                text_instances = instances[0]
-                page_crop_rect = fitz.Rect(0, 0, page.rect.width - 8, text_instances.y0 + 20)
-                page.set_cropbox(page_crop_rect)
-        except Exception:
-            continue
-    save_path = pdf_path.replace(".pdf", "_whitespace.pdf")
-    doc.save(save_path, garbage=4, deflate=True, clean=True)
-    doc.close()
-    os.remove(pdf_path)
-    return save_path
-
 # ---------- PDF CROPPING ----------
 def pdf_cropper(pdf_path, config, df=None):
     now = datetime.now()
     formatted_datetime = now.strftime("%d-%m-%y %I:%M %p")
-    source_pdf = fitz.open(pdf_path)
+    # The cropper seeks all over the source (text search plus two clip
+    # copies per page, in sorted rather than file order), so slurp the
+    # file once and let MuPDF random-access the buffer; filetype skips
+    # the extension sniff on the anonymous stream
+    with open(pdf_path, "rb") as f:
+        source_pdf = fitz.open(stream=f.read(), filetype="pdf")
     result = fitz.open()
 
     page_order = df.sort_values(by="qty", ascending=False)["page"].tolist() if df is not None and "qty" in df.columns else list(range(len(source_pdf)))
     error_pages = []
 
+    # Pre-bound locals: each of these is a C-level property or attribute
+    # lookup that would otherwise repeat on every page
+    new_page = result.new_page
+
+    # Labels in a batch share geometry page after page, so destination
+    # rects are memoized instead of allocating a fresh wrapper each time;
+    # clip rects stay per-page since their offsets genuinely vary
+    rect_cache = {}
+    def dest_rect(x0, y0, x1, y1):
+        key = (x0, y0, x1, y1)
+        r = rect_cache.get(key)
+        if r is None:
+            r = rect_cache[key] = fitz.Rect(x0, y0, x1, y1)
+        return r
+
+    # Pass 1: every text search and all clip geometry, reading only the
+    # source. Detection failures drop the page to the error list here so
+    # the emission pass below never mixes searches with page-tree edits.
+    specs = []
     for page_no in page_order:
         try:
             page = source_pdf[page_no]
-            try:
-                label_pos = page.search_for("TAX INVOICE")[0]
-                label_crop_rect = fitz.Rect(0, 0, page.rect.width, max(label_pos.y0 - 1, 1))
-            except Exception:
-                label_crop_rect = fitz.Rect(0, 0, page.rect.width, max(page.rect.height / 4, 1))
-
-            try:
-                invoice_pos = page.search_for("TAX INVOICE")[0].y1
-            except Exception:
-                invoice_pos = page.rect.height / 2
-            try:
-                online_payment_pos = page.search_for("for online payments (as applicable)")[0].y0 + 20
-            except Exception:
-                online_payment_pos = page.rect.height
-
-            invoice_crop_rect = fitz.Rect(0, max(invoice_pos - 18, 0), page.rect.width, online_payment_pos)
+            rect = page.rect
+            ph = rect.height
+            # search_for re-extracts the text layer on every call, so run
+            # each term once per page and reuse the hit for both crops
+            online_hits = page.search_for("for online payments (as applicable)")
+            # Width/bottom clamps folded in from the old pdf_whitespace
+            # pass (8pt right-margin trim, cut below the payments line),
+            # so the sorted PDF is opened and saved once instead of twice
+            pw = rect.width - 8 if online_hits else rect.width
+            online_payment_pos = online_hits[0].y0 + 20 if online_hits else ph
+
+            tax_hits = page.search_for("TAX INVOICE")
+            if tax_hits:
+                label_crop_rect = fitz.Rect(0, 0, pw, max(tax_hits[0].y0 - 1, 1))
+                invoice_pos = tax_hits[0].y1
+            else:
+                label_crop_rect = fitz.Rect(0, 0, pw, max(ph / 4, 1))
+                invoice_pos = ph / 2
+
+            invoice_crop_rect = fitz.Rect(0, max(invoice_pos - 18, 0), pw, online_payment_pos)
             if invoice_crop_rect.height <= 0:
-                invoice_crop_rect = fitz.Rect(0, 0, page.rect.width, page.rect.height / 2)
-
-            if config.get("keep_invoice With 4x4") or config.get("4x4"):
-                combined_page = result.new_page(width=page.rect.width, height=label_crop_rect.height + invoice_crop_rect.height)
-                combined_page.show_pdf_page(fitz.Rect(0, 0, page.rect.width, label_crop_rect.height), source_pdf, page_no, clip=label_crop_rect)
-                combined_page.show_pdf_page(fitz.Rect(0, label_crop_rect.height, page.rect.width, combined_page.rect.height), source_pdf, page_no, clip=invoice_crop_rect)
-            elif config.get("keep_invoice"):
-                label_page = result.new_page(width=page.rect.width, height=label_crop_rect.height)
+                invoice_crop_rect = fitz.Rect(0, 0, pw, ph / 2)
+
+            specs.append((page_no, pw, label_crop_rect, invoice_crop_rect))
+        except Exception:
+            error_pages.append(page_no)
+
+    # The config is constant for the batch, so resolve the mode flags
+    # once instead of three dict lookups per page
+    mode_4x4 = config.get("keep_invoice With 4x4") or config.get("4x4")
+    keep_invoice = config.get("keep_invoice")
+    add_date = config.get("add_date_on_top")
+
+    # Pass 2: grow the result and paint the prepared crops — nothing here
+    # but new_page/show_pdf_page, one tight append run over the specs
+    for page_no, pw, label_crop_rect, invoice_crop_rect in specs:
+        try:
+            if mode_4x4:
+                combined_page = new_page(width=pw, height=label_crop_rect.height + invoice_crop_rect.height)
+                combined_page.show_pdf_page(dest_rect(0, 0, pw, label_crop_rect.height), source_pdf, page_no, clip=label_crop_rect)
+                combined_page.show_pdf_page(dest_rect(0, label_crop_rect.height, pw, combined_page.rect.height), source_pdf, page_no, clip=invoice_crop_rect)
+            elif keep_invoice:
+                label_page = new_page(width=pw, height=label_crop_rect.height)
                 if label_crop_rect.height > 0:
-                    label_page.show_pdf_page(fitz.Rect(0, 0, label_crop_rect.width, label_crop_rect.height), source_pdf, page_no, clip=label_crop_rect)
+                    label_page.show_pdf_page(dest_rect(0, 0, label_crop_rect.width, label_crop_rect.height), source_pdf, page_no, clip=label_crop_rect)
 
-                invoice_page = result.new_page(width=page.rect.width, height=invoice_crop_rect.height)
+                invoice_page = new_page(width=pw, height=invoice_crop_rect.height)
                 if invoice_crop_rect.height > 0:
-                    invoice_page.show_pdf_page(fitz.Rect(0, 0, invoice_crop_rect.width, invoice_crop_rect.height), source_pdf, page_no, clip=invoice_crop_rect)
+                    invoice_page.show_pdf_page(dest_rect(0, 0, invoice_crop_rect.width, invoice_crop_rect.height), source_pdf, page_no, clip=invoice_crop_rect)
             else:
-                label_page = result.new_page(width=page.rect.width, height=label_crop_rect.height)
+                label_page = new_page(width=pw, height=label_crop_rect.height)
                 if label_crop_rect.height > 0:
-                    label_page.show_pdf_page(fitz.Rect(0, 0, label_crop_rect.width, label_crop_rect.height), source_pdf, page_no, clip=label_crop_rect)
+                    label_page.show_pdf_page(dest_rect(0, 0, label_crop_rect.width, label_crop_rect.height), source_pdf, page_no, clip=label_crop_rect)
 
-            if config.get("add_date_on_top"):
+            if add_date:
                 result[-1].insert_text(fitz.Point(12, 10), formatted_datetime, fontsize=11)
 
-        except Exception as e:
+        except Exception:
             error_pages.append(page_no)
 
     if error_pages:
-        for page_no in error_pages:
-            result.insert_pdf(source_pdf, from_page=page_no, to_page=page_no)
+        for start, end in _page_ranges(sorted(error_pages)):
+            result.insert_pdf(source_pdf, from_page=start, to_page=end)
 
     output_filename = os.path.join("temp", "result_temp.pdf")
     result.save(output_filename, garbage=4, deflate=True, clean=True)
@@ -238,25 +291,41 @@ def pdf_cropper(pdf_path, config, df=None):
     return output_filename
 
 # ---------- EXCEL REPORT GENERATION ----------
+def _counts(df, cols, count_col):
+    # value_counts sorts by frequency internally and every block re-sorts
+    # right after; an unsorted groupby skips the throwaway sort
+    return df.groupby(cols, sort=False, observed=True).size().reset_index(name=count_col)
+
 def create_count_excel(df, save_path):
-    sku_df = df[["qty", "soldBy", "color", "sku"]].value_counts().reset_index()
+    sku_df = _counts(df, ["qty", "soldBy", "color", "sku"], "Count")
     sku_df.columns = ["Qty", "SoldBy", "Color", "SKU", "Count"]
-    sku_df["SKU_lower"] = sku_df["SKU"].str.lower()
-    sku_df = sku_df.sort_values(by=["Count", "SKU_lower", "Qty"], ascending=[False, True, True]).drop(columns=["SKU_lower"]).reset_index(drop=True)
-
-    courierSold_df = df[["courier", "soldBy"]].value_counts().reset_index()
+    # The key callable lowercases SKU on the fly instead of materializing
+    # a throwaway SKU_lower column just to drop it again
+    sku_df = sku_df.sort_values(
+        by=["Count", "SKU", "Qty"],
+        ascending=[False, True, True],
+        key=lambda s: s.str.lower() if s.name == "SKU" else s,
+    ).reset_index(drop=True)
+
+    courierSold_df = _counts(df, ["courier", "soldBy"], "Packages")
     courierSold_df.columns = ["Courier", "SoldBy", "Packages"]
     courierSold_df = courierSold_df.sort_values(by=["Packages", "Courier"], ascending=[False, True]).reset_index(drop=True)
 
-    courier_df = df[["courier"]].value_counts().reset_index()
+    courier_df = _counts(df, ["courier"], "Packages")
     courier_df.columns = ["Courier", "Packages"]
     courier_df = courier_df.sort_values(by=["Packages", "Courier"], ascending=[False, True]).reset_index(drop=True)
 
-    soldby_df = df[["soldBy"]].value_counts().reset_index()
+    soldby_df = _counts(df, ["soldBy"], "Packages")
     soldby_df.columns = ["SoldBy", "Packages"]
     soldby_df = soldby_df.sort_values(by=["Packages", "SoldBy"], ascending=[False, True]).reset_index(drop=True)
 
-    with pd.ExcelWriter(save_path, engine="xlsxwriter") as writer:
+    # constant_memory streams each finished row straight to disk instead
+    # of holding the whole sheet in RAM until close
+    with pd.ExcelWriter(
+        save_path,
+        engine="xlsxwriter",
+        engine_kwargs={"options": {"constant_memory": True}},
+    ) as writer:
         workbook = writer.book
         worksheet = workbook.add_worksheet("Summary")
         writer.sheets["Summary"] = worksheet
@@ -272,12 +341,19 @@ def create_count_excel(df, save_path):
             row += 1
             worksheet.write_row(row, 0, df_block.columns, header_format)
             row += 1
+            # Column widths ride along with the write loop — the cells are
+            # already in hand per row, so there is no second pass over the
+            # block (and no throwaway all-str frame) just to measure them
+            widths = [len(str(col)) for col in df_block.columns]
             for r in df_block.itertuples(index=False):
                 worksheet.write_row(row, 0, r, wrap_format)
                 row += 1
-            for i, col in enumerate(df_block.columns):
-                max_len = max(len(str(col)), *(len(str(val)) for val in df_block[col]))
-                worksheet.set_column(i, i, min(max_len + 2, 30))
+                for i, cell in enumerate(r):
+                    length = len(str(cell))
+                    if length > widths[i]:
+                        widths[i] = length
+            for i, width in enumerate(widths):
+                worksheet.set_column(i, i, min(width + 2, 30))
             row += 2
 
         write_block("SKU REPORT", sku_df)